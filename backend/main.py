@@ -3,31 +3,87 @@ Acadza WebSocket Assignment
 
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+import ahocorasick
+import orjson
 import os
-import json
+import sys
 import re
 from dotenv import load_dotenv
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Iterator, Set, Union, Callable, Awaitable, Deque
+from dataclasses import dataclass, field
+from array import array
+from collections import OrderedDict, deque
+from string import Template
+from contextlib import asynccontextmanager
 import logging
 from datetime import datetime
 import random
+import itertools
+import heapq
+import hashlib
+import math
+import operator
+import functools
+import contextvars
+from types import MappingProxyType
 import asyncio  # Added for non-blocking sleeps
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+try:
+    import uvloop  # libuv event loop; not available on Windows
+except ImportError:
+    uvloop = None
 
 # Load environment variables
 load_dotenv()
 
+# Configure logging (LOG_LEVEL=WARNING in production skips the per-message records)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+logger = logging.getLogger(__name__)
+
+# Configure Google Gemini AI
+GEMINI_MODEL_NAME = 'gemini-2.5-flash'
+# Upper bound on one follow-up call; past this we use the keyword fallback question
+GEMINI_TIMEOUT_SECONDS = 5.0
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+if not GEMINI_API_KEY:
+    logger.error("GEMINI_API_KEY not found in environment variables")
+    # For local testing without API key, you might want to handle this gracefully
+    # raise ValueError("GEMINI_API_KEY is required")
+else:
+    genai.configure(api_key=GEMINI_API_KEY)
+
+
+# Shared sampling settings for every follow-up question
+_FOLLOW_UP_GEN_CONFIG = genai.types.GenerationConfig(temperature=0.95, top_p=0.95)
+
+
+@functools.cache
+def get_model() -> genai.GenerativeModel:
+    """One model per worker, created on first use; every call shares its underlying client channel"""
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker startup: tune the event loop and build the Gemini model before the first request"""
+    # Tasks that finish without awaiting run inline instead of being scheduled (Python 3.12+)
+    if sys.version_info >= (3, 12):
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+    if GEMINI_API_KEY:
+        get_model()
+    yield
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Acadza - Mind-Bending AI Interview",
     description="The AI that actually gets you. Built to stand out.",
-    version="3.0.0"
+    version="3.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -39,82 +95,125 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure Google Gemini AI
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    logger.error("GEMINI_API_KEY not found in environment variables")
-    # For local testing without API key, you might want to handle this gracefully
-    # raise ValueError("GEMINI_API_KEY is required")
-else:
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-2.5-flash')
+
+# Per-session RNG, set when a WebSocket is accepted; the shared default covers calls outside a session
+session_rng: contextvars.ContextVar[random.Random] = contextvars.ContextVar('session_rng', default=random.Random())
+
+
+def _shuffled_cycle(templates: Tuple[str, ...]) -> Iterator[Tuple[str, ...]]:
+    """
+    Endlessly cycle through the templates in a random order fixed at load time.
+    Each template comes pre-split at {keyword}, so filling it is just keyword.join(parts).
+    """
+    split_templates = [tuple(template.split("{keyword}")) for template in templates]
+    return itertools.cycle(random.sample(split_templates, len(split_templates)))
 
 
 class PsychologicalTriggers:
     """Research-backed psychological engagement techniques"""
     
     # Curiosity Gap Openers (make them NEED to answer)
-    CURIOSITY_OPENERS = [
+    CURIOSITY_OPENERS = (
         "Wait, that's interesting because...",
         "Here's what most people don't realize about {keyword}...",
         "You know what's weird? When you said {keyword}, it reminded me of...",
         "Plot twist about {keyword} -",
         "Fun fact: people who say {keyword} usually..."
-    ]
+    )
     
     # Pattern Interrupts (unexpected responses)
-    PATTERN_INTERRUPTS = [
+    PATTERN_INTERRUPTS = (
         "Hold up. Let me challenge that for a sec...",
         "Okay, controversial question coming...",
         "Here's something nobody asks about {keyword}, but they should:",
         "Devil's advocate mode: what if {keyword} isn't actually..."
-    ]
+    )
     
     # Deep Dive Triggers (make them think harder)
-    DEEP_DIVE_TRIGGERS = [
+    DEEP_DIVE_TRIGGERS = (
         "But WHY does {keyword} matter to you specifically?",
         "If {keyword} was a person, what would you say to them?",
         "Imagine it's 5 years from now. How has {keyword} changed?",
         "What would 10-year-old you think about your relationship with {keyword}?"
-    ]
+    )
     
     # Emotional Mirrors (reflect their energy)
     EMOTIONAL_MIRRORS = {
-        'intense': ["That's some SERIOUS energy about {keyword}!", "Whoa, you're not holding back on {keyword}!"],
-        'moderate': ["I can tell {keyword} means something to you.", "There's definitely something about {keyword} for you."],
-        'calm': ["Interesting take on {keyword}.", "That's a thoughtful way to see {keyword}."]
+        'intense': ("That's some SERIOUS energy about {keyword}!", "Whoa, you're not holding back on {keyword}!"),
+        'moderate': ("I can tell {keyword} means something to you.", "There's definitely something about {keyword} for you."),
+        'calm': ("Interesting take on {keyword}.", "That's a thoughtful way to see {keyword}.")
     }
     
-    @staticmethod
-    def get_random_opener(keyword: str) -> str:
+    # Pre-shuffled, pre-split cyclers so each call is a next() and a join instead of an RNG draw and a format
+    _OPENER_ITER = _shuffled_cycle(CURIOSITY_OPENERS)
+    _INTERRUPT_ITER = _shuffled_cycle(PATTERN_INTERRUPTS)
+    _DEEP_DIVE_ITER = _shuffled_cycle(DEEP_DIVE_TRIGGERS)
+    _MIRROR_ITERS = {intensity: _shuffled_cycle(mirrors) for intensity, mirrors in EMOTIONAL_MIRRORS.items()}
+    
+    @classmethod
+    def get_random_opener(cls, keyword: str) -> str:
         """Get a curiosity-inducing opener"""
-        opener = random.choice(PsychologicalTriggers.CURIOSITY_OPENERS)
-        return opener.replace("{keyword}", keyword)
+        return keyword.join(next(cls._OPENER_ITER))
     
-    @staticmethod
-    def get_pattern_interrupt(keyword: str) -> str:
+    @classmethod
+    def get_pattern_interrupt(cls, keyword: str) -> str:
         """Get a pattern interrupt phrase"""
-        interrupt = random.choice(PsychologicalTriggers.PATTERN_INTERRUPTS)
-        return interrupt.replace("{keyword}", keyword)
+        return keyword.join(next(cls._INTERRUPT_ITER))
     
-    @staticmethod
-    def get_deep_dive(keyword: str) -> str:
+    @classmethod
+    def get_deep_dive(cls, keyword: str) -> str:
         """Get a deep-dive trigger"""
-        trigger = random.choice(PsychologicalTriggers.DEEP_DIVE_TRIGGERS)
-        return trigger.replace("{keyword}", keyword)
+        return keyword.join(next(cls._DEEP_DIVE_ITER))
     
-    @staticmethod
-    def get_emotional_mirror(intensity: str, keyword: str) -> str:
+    @classmethod
+    def get_emotional_mirror(cls, intensity: str, keyword: str) -> str:
         """Get an emotional mirror response"""
-        mirrors = PsychologicalTriggers.EMOTIONAL_MIRRORS.get(intensity, PsychologicalTriggers.EMOTIONAL_MIRRORS['moderate'])
-        mirror = random.choice(mirrors)
-        return mirror.replace("{keyword}", keyword)
+        mirrors = cls._MIRROR_ITERS.get(intensity, cls._MIRROR_ITERS['moderate'])
+        return keyword.join(next(mirrors))
+
+
+def _flatten_emotion_patterns(patterns: Dict[str, Dict]) -> Tuple[Tuple[str, ...], Tuple[Tuple[str, str, str], ...]]:
+    """Flatten emotion patterns into parallel (keyword, payload) tuples, in priority order"""
+    keywords = []
+    payloads = []
+    for emotion_name, emotion_data in patterns.items():
+        # Interned so every payload and downstream comparison shares one object per string
+        payload = (sys.intern(emotion_name), sys.intern(emotion_data['emoji']), sys.intern(emotion_data['description']))
+        for keyword in emotion_data['keywords']:
+            keywords.append(keyword)
+            payloads.append(payload)
+    return tuple(keywords), tuple(payloads)
+
+
+def _build_emotion_automaton(keywords: Tuple[str, ...], intensifiers: frozenset) -> ahocorasick.Automaton:
+    """Build a single Aho-Corasick automaton over every emotion keyword and intensifier"""
+    automaton = ahocorasick.Automaton()
+    for index, keyword in enumerate(keywords):
+        automaton.add_word(keyword, index)
+    # Intensifiers map to -1 - they only flag the message as intense
+    for word in intensifiers:
+        automaton.add_word(word, -1)
+    automaton.make_automaton()
+    return automaton
+
+
+def _build_signal_automaton(signals: Dict[str, Tuple[str, ...]]) -> ahocorasick.Automaton:
+    """Build an Aho-Corasick automaton mapping each signal phrase to the flags it raises"""
+    flags_by_phrase: Dict[str, set] = {}
+    for flag, phrases in signals.items():
+        for phrase in phrases:
+            flags_by_phrase.setdefault(phrase, set()).add(flag)
+    automaton = ahocorasick.Automaton()
+    for phrase, flags in flags_by_phrase.items():
+        automaton.add_word(phrase, frozenset(flags))
+    automaton.make_automaton()
+    return automaton
 
 
 class EmotionDetector:
     """Advanced emotion detection with intensity and context"""
     
-    EMOTION_PATTERNS = {
+    EMOTION_PATTERNS = MappingProxyType({
         'passionate_love': {
             'keywords': ['love', 'adore', 'passionate', 'obsessed', 'can\'t get enough'],
             'emoji': '🔥',
@@ -155,152 +254,228 @@ class EmotionDetector:
             'emoji': '🧐',
             'description': 'curious'
         }
-    }
+    })
+    
+    INTENSIFIERS = frozenset(['really', 'very', 'so', 'extremely', 'absolutely', 'totally', 'completely'])
+    
+    # Struct-of-arrays view: _PAYLOADS[i] is the (emotion, emoji, description) for _KEYWORDS[i]
+    _KEYWORDS, _PAYLOADS = _flatten_emotion_patterns(EMOTION_PATTERNS)
+    
+    # Built once at class load; scans a message in one linear pass
+    AUTOMATON = _build_emotion_automaton(_KEYWORDS, INTENSIFIERS)
     
     @staticmethod
     def detect_emotion(text: str) -> Tuple[str, str, str, str]:
         """Returns (emotion, emoji, description, intensity)"""
+        # Short replies ("yes", "love it") repeat a lot; long novel text would only churn the cache
+        if len(text) <= 64:
+            return EmotionDetector._detect_cached(text)
+        return EmotionDetector._detect(text)
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=2048)
+    def _detect_cached(text: str) -> Tuple[str, str, str, str]:
+        """Memoized detection for short messages"""
+        return EmotionDetector._detect(text)
+    
+    @staticmethod
+    def _detect(text: str) -> Tuple[str, str, str, str]:
+        """Scan the text for the strongest emotion and its intensity"""
         text_lower = text.lower()
         
-        # Check for intensifiers
-        intensifiers = ['really', 'very', 'so', 'extremely', 'absolutely', 'totally', 'completely']
-        has_intensifier = any(word in text_lower for word in intensifiers)
+        # Single pass: collect intensifiers and the highest-priority (lowest index) keyword
+        has_intensifier = False
+        best_index = len(EmotionDetector._KEYWORDS)
+        for _, index in EmotionDetector.AUTOMATON.iter(text_lower):
+            if index < 0:
+                has_intensifier = True
+            elif index < best_index:
+                best_index = index
         
-        # Detect emotion
-        for emotion_name, emotion_data in EmotionDetector.EMOTION_PATTERNS.items():
-            for keyword in emotion_data['keywords']:
-                if keyword in text_lower:
-                    intensity = 'intense' if has_intensifier or '!' in text else 'moderate'
-                    return (emotion_name, emotion_data['emoji'], emotion_data['description'], intensity)
+        if best_index < len(EmotionDetector._KEYWORDS):
+            intensity = 'intense' if has_intensifier or '!' in text else 'moderate'
+            return EmotionDetector._PAYLOADS[best_index] + (intensity,)
         
         return ('neutral', '💭', 'thoughtful', 'calm')
 
 
+@dataclass
+class SessionStats:
+    """Running conversation signals, updated as each user message is recorded"""
+    # Word count of each message, packed as C unsigned ints
+    message_lengths: array = field(default_factory=lambda: array('I'))
+    signals: Set[str] = field(default_factory=set)
+    
+    @property
+    def word_count(self) -> int:
+        return sum(self.message_lengths)
+    
+    @property
+    def messages(self) -> int:
+        return len(self.message_lengths)
+
+
 class PersonalityAnalyzer:
     """Deep personality analysis with predictions and insights"""
     
-    PERSONALITY_TYPES = {
+    PERSONALITY_TYPES = MappingProxyType({
         'rebel_learner': {
             'name': 'The Rebel Learner 🎸',
-            'traits': [
+            'traits': (
                 'Questions everything before accepting it',
                 'Hates being told what to do without explanation',
                 'Learns best by challenging the status quo',
                 'Gets bored with traditional methods FAST'
-            ],
+            ),
             'description': 'You\'re not difficult - you\'re just wired to understand the \'WHY\' before the \'HOW\'. Rules without reasons? Hard pass. But give you a puzzle to solve? You\'re ALL in.',
             'advice': 'Forget textbooks. Try: debate clubs, real-world projects, teaching yourself by doing the opposite of what you\'re told (ironically, that makes you learn faster).',
             'prediction': 'In 3 years, you\'ll look back and realize all your best skills came from things you taught YOURSELF, not from courses.',
             'secret_strength': 'Your "rebellion" is actually critical thinking in disguise. That\'s rare. Don\'t lose it.',
             'challenge': 'Try this: Pick ONE "boring" thing and find a way to make it interesting by breaking the rules. Then tell someone what you discovered.',
-            'would_succeed_at': ['Entrepreneurship', 'Innovation', 'Problem-solving roles', 'Creative industries']
+            'would_succeed_at': ('Entrepreneurship', 'Innovation', 'Problem-solving roles', 'Creative industries')
         },
         'passionate_explorer': {
             'name': 'The Passionate Explorer 🔥',
-            'traits': [
+            'traits': (
                 'When something clicks, you dive DEEP',
                 'Connects random dots others miss',
                 'Gets obsessed with topics (in a good way)',
                 'Bored by surface-level understanding'
-            ],
+            ),
             'description': 'You don\'t just "study" - you devour. When a topic excites you, 3am research sessions happen naturally. Your superpower? You see connections between things that seem unrelated.',
             'advice': 'Stop trying to learn everything. Follow your obsessions wherever they lead. That 3am deep-dive into a random topic? That\'s not procrastination - that\'s you finding your edge.',
             'prediction': 'Your career won\'t be a straight line. It\'ll zigzag through interests, and each "random" skill will connect later in ways you can\'t imagine now.',
             'secret_strength': 'Your curiosity is a compound interest machine. Every deep dive pays dividends later.',
             'challenge': 'Take your latest obsession and explain it to someone in a way that makes THEM curious too. That\'s your superpower.',
-            'would_succeed_at': ['Research', 'Creative writing', 'Product design', 'Content creation']
+            'would_succeed_at': ('Research', 'Creative writing', 'Product design', 'Content creation')
         },
         'practical_builder': {
             'name': 'The Practical Builder 🛠️',
-            'traits': [
+            'traits': (
                 'Learns by DOING, not reading',
                 'Theory is boring until you see it work',
                 'Needs real examples and hands-on practice',
                 'Fixes things by trying, failing, trying again'
-            ],
+            ),
             'description': 'Watching tutorials? Meh. Building something broken at 2am? THAT\'S when you learn. You need your hands dirty, not your notes perfect.',
             'advice': 'Stop watching. Start building. Even if it breaks. ESPECIALLY if it breaks. Every error message is a lesson you\'ll never forget.',
             'prediction': 'In 2 years, you\'ll have built more real things than people with "better grades". And companies will want YOU, not the theory experts.',
             'secret_strength': 'You learn in weeks what takes others months, because you\'re not afraid to break things.',
             'challenge': 'Build something today. Anything. It can be broken, ugly, or "wrong". Just make it REAL.',
-            'would_succeed_at': ['Software development', 'Engineering', 'Trades', 'Startups']
+            'would_succeed_at': ('Software development', 'Engineering', 'Trades', 'Startups')
         },
         'thoughtful_analyst': {
             'name': 'The Thoughtful Analyst 🧠',
-            'traits': [
+            'traits': (
                 'Thinks deeply before speaking',
                 'Notices patterns others overlook',
                 'Processes information at a deeper level',
                 'Quiet, but your insights are gold'
-            ],
+            ),
             'description': 'You\'re the one who stays quiet in discussions, then drops a comment that makes everyone pause. You see the Matrix while others see the movie.',
             'advice': 'Your insights are MORE valuable than you think. Start sharing them, even if you feel like "everyone already knows this" (spoiler: they don\'t).',
             'prediction': 'People will start coming to YOU for advice because your quiet observations solve problems others can\'t even see.',
             'secret_strength': 'While others chase quick answers, you\'re building deep understanding. That compounds over time.',
             'challenge': 'Share ONE insight this week that you usually keep to yourself. Watch what happens.',
-            'would_succeed_at': ['Data science', 'Strategy', 'Research', 'Consulting']
+            'would_succeed_at': ('Data science', 'Strategy', 'Research', 'Consulting')
         },
         'adaptive_chameleon': {
             'name': 'The Adaptive Chameleon 🦎',
-            'traits': [
+            'traits': (
                 'Adjusts learning style based on the topic',
                 'Comfortable with change and uncertainty',
                 'Can switch between deep focus and big picture',
                 'Doesn\'t fit neatly into one category'
-            ],
+            ),
             'description': 'You\'re fluid. Sometimes you\'re hands-on, sometimes theoretical. Sometimes social, sometimes solo. That\'s not inconsistency - that\'s versatility.',
             'advice': 'Stop trying to "find your style". Your style IS adaptability. Use it. That makes you valuable in unpredictable situations.',
             'prediction': 'You\'ll thrive in roles where others struggle - the ones that need someone who can "figure it out" without a playbook.',
             'secret_strength': 'While others need the "right environment", you create your own. That\'s a superpower in 2026.',
             'challenge': 'Try learning something completely outside your comfort zone. You\'ll adapt faster than you think.',
-            'would_succeed_at': ['Project management', 'Consulting', 'Entrepreneurship', 'Creative roles']
+            'would_succeed_at': ('Project management', 'Consulting', 'Entrepreneurship', 'Creative roles')
         }
+    })
+    
+    # Phrases that raise each conversation signal (matched as substrings)
+    PERSONALITY_SIGNALS = {
+        'strong_negatives': ('hate', 'despise', 'can\'t stand', 'never'),
+        'strong_positives': ('love', 'adore', 'passionate', 'excited'),
+        'questions': ('?', 'why', 'how', 'what if'),
+        'action_words': ('do', 'build', 'make', 'create', 'try'),
+        'specifics': ('when', 'because', 'example', 'specifically', 'actually')
     }
     
+    SIGNAL_AUTOMATON = _build_signal_automaton(PERSONALITY_SIGNALS)
+    
     @staticmethod
-    def analyze_conversation(history: List[Dict[str, str]]) -> Dict[str, any]:
+    def update_stats(stats: SessionStats, text: str):
+        """Fold one user message into the running session stats"""
+        text_lower = text.lower()
+        stats.message_lengths.append(len(text_lower.split()))
+        for _, flags in PersonalityAnalyzer.SIGNAL_AUTOMATON.iter(text_lower):
+            stats.signals |= flags
+    
+    @staticmethod
+    def analyze_conversation(history: List[Tuple[str, str]], stats: Optional[SessionStats] = None) -> Dict[str, any]:
         """Deep personality analysis with predictions"""
         
         if not history:
             return PersonalityAnalyzer._get_default_analysis()
         
-        # Combine all user responses
-        all_responses = " ".join([msg['user'].lower() for msg in history])
+        # Sessions keep running stats; otherwise fold the history in now
+        if stats is None:
+            stats = SessionStats()
+            for user_message, _ in history:
+                PersonalityAnalyzer.update_stats(stats, user_message)
+        
+        word_count = stats.word_count
+        personality_key = PersonalityAnalyzer._classify(stats.signals, word_count, stats.messages)
         
-        # Pattern detection
-        word_count = len(all_responses.split())
+        # Calculate scores
+        rng = session_rng.get()
+        engagement_score = min(100, int(word_count * 3 + rng.randint(10, 20)))
+        honesty_score = 85 + rng.randint(0, 15)
+        
+        # Only the scores change between sessions; the rest is cached per type
+        return PersonalityAnalyzer._base_payload(personality_key) | {
+            "engagement_score": engagement_score,
+            "honesty_level": honesty_score
+        }
+    
+    @staticmethod
+    def _classify(signals: Set[str], word_count: int, turns: int) -> str:
+        """Pick the personality type key that best fits the conversation signals"""
         
         # Emotional patterns
-        has_strong_negatives = any(word in all_responses for word in ['hate', 'despise', 'can\'t stand', 'never'])
-        has_strong_positives = any(word in all_responses for word in ['love', 'adore', 'passionate', 'excited'])
-        has_questions = any(char in all_responses for char in ['?', 'why', 'how', 'what if'])
-        has_action_words = any(word in all_responses for word in ['do', 'build', 'make', 'create', 'try'])
-        uses_specifics = any(word in all_responses for word in ['when', 'because', 'example', 'specifically', 'actually'])
+        has_strong_negatives = 'strong_negatives' in signals
+        has_strong_positives = 'strong_positives' in signals
+        has_questions = 'questions' in signals
+        has_action_words = 'action_words' in signals
+        uses_specifics = 'specifics' in signals
         
         # Response length analysis
-        avg_response_length = word_count / len(history)
+        avg_response_length = word_count / turns
         is_detailed = avg_response_length > 8
         is_concise = avg_response_length < 5
         
         # Determine personality type
         if has_questions and has_strong_negatives:
-            personality_key = 'rebel_learner'
+            return 'rebel_learner'
         elif has_strong_positives and is_detailed:
-            personality_key = 'passionate_explorer'
+            return 'passionate_explorer'
         elif has_action_words and uses_specifics:
-            personality_key = 'practical_builder'
+            return 'practical_builder'
         elif is_detailed and not has_action_words:
-            personality_key = 'thoughtful_analyst'
+            return 'thoughtful_analyst'
         else:
-            personality_key = 'adaptive_chameleon'
-        
+            return 'adaptive_chameleon'
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=5)
+    def _base_payload(personality_key: str) -> MappingProxyType:
+        """Static part of the analysis for a personality type, built once per key"""
         personality = PersonalityAnalyzer.PERSONALITY_TYPES[personality_key]
-        
-        # Calculate scores
-        engagement_score = min(100, int(word_count * 3 + random.randint(10, 20)))
-        honesty_score = 85 + random.randint(0, 15)
-        
-        return {
+        return MappingProxyType({
             "type": personality['name'],
             "traits": personality['traits'],
             "description": personality['description'],
@@ -308,10 +483,8 @@ class PersonalityAnalyzer:
             "prediction": personality['prediction'],
             "secret_strength": personality['secret_strength'],
             "challenge": personality['challenge'],
-            "would_succeed_at": personality['would_succeed_at'],
-            "engagement_score": engagement_score,
-            "honesty_level": honesty_score
-        }
+            "would_succeed_at": personality['would_succeed_at']
+        })
     
     @staticmethod
     def _get_default_analysis():
@@ -333,21 +506,24 @@ class PersonalityAnalyzer:
 class InteractiveBonusGenerator:
     """Generate mind-bending interactive experiences after conversation"""
     
+    # Compiled once; one C-level scan instead of a Python loop of substring tests
+    CHALLENGE_RE = re.compile(r"hard|difficult|challenge")
+    
     @staticmethod
-    def generate_mind_reading_game(history: List[Dict[str, str]]) -> Dict[str, any]:
+    def generate_mind_reading_game(history: List[Tuple[str, str]]) -> Dict[str, any]:
         """Create a "mind reading" prediction game"""
         
-        # Analyze conversation for patterns
-        user_words = " ".join([msg['user'] for msg in history])
+        # Analyze conversation for patterns (lowercased once, shared by every check)
+        user_words_lower = " ".join([user_message for user_message, _ in history]).lower()
         
         # Generate predictions
         predictions = []
         
-        if 'hate' in user_words.lower():
+        if 'hate' in user_words_lower:
             predictions.append("You tend to avoid things that feel like a waste of time")
-        if 'love' in user_words.lower():
+        if 'love' in user_words_lower:
             predictions.append("When you're into something, you go ALL in")
-        if any(word in user_words.lower() for word in ['hard', 'difficult', 'challenge']):
+        if InteractiveBonusGenerator.CHALLENGE_RE.search(user_words_lower):
             predictions.append("You're secretly attracted to challenges (even if you complain about them)")
         
         # Add universal predictions that feel personal
@@ -364,27 +540,34 @@ class InteractiveBonusGenerator:
             "challenge": "How many did I get right? (Be honest! 😏)"
         }
     
+    FUTURE_SCENARIOS = {
+        'rebel': "You'll probably end up in a role where you make the rules, not follow them. Mark my words.",
+        'explorer': "In 5 years, your 'random interests' will connect into something unique that others can't replicate.",
+        'builder': "You'll have a portfolio of real projects while others are still collecting certificates. That's your edge.",
+        'analyst': "People will seek you out for insights. Your quiet observations will become your brand.",
+        'chameleon': "You'll thrive in chaos while others freeze. That adaptability is worth more than any degree."
+    }
+    
+    # Every personality type name ends with its emoji, e.g. "The Rebel Learner 🎸"
+    EMOJI_TO_SCENARIO = {
+        '🎸': 'rebel',
+        '🔥': 'explorer',
+        '🎭': 'explorer',  # The Mystery Explorer (default analysis)
+        '🛠️': 'builder',
+        '🧠': 'analyst',
+        '🦎': 'chameleon'
+    }
+    
     @staticmethod
     def generate_future_vision(personality_type: str) -> Dict[str, any]:
         """Generate a future scenario based on personality"""
         
-        scenarios = {
-            'rebel': "You'll probably end up in a role where you make the rules, not follow them. Mark my words.",
-            'explorer': "In 5 years, your 'random interests' will connect into something unique that others can't replicate.",
-            'builder': "You'll have a portfolio of real projects while others are still collecting certificates. That's your edge.",
-            'analyst': "People will seek you out for insights. Your quiet observations will become your brand.",
-            'chameleon': "You'll thrive in chaos while others freeze. That adaptability is worth more than any degree."
-        }
-        
-        # Extract key from personality type
-        key = 'rebel' if 'Rebel' in personality_type else \
-              'explorer' if 'Explorer' in personality_type else \
-              'builder' if 'Builder' in personality_type else \
-              'analyst' if 'Analyst' in personality_type else 'chameleon'
+        # Extract key from the personality type's trailing emoji
+        key = InteractiveBonusGenerator.EMOJI_TO_SCENARIO.get(personality_type.rsplit(' ', 1)[-1], 'chameleon')
         
         return {
             "title": "🔭 Time Machine: Your Future",
-            "vision": scenarios[key],
+            "vision": InteractiveBonusGenerator.FUTURE_SCENARIOS[key],
             "reminder": "Screenshot this. Check back in 6 months. I'll wait. 😏"
         }
     
@@ -405,49 +588,91 @@ class InteractiveBonusGenerator:
 # HELPER FUNCTIONS FOR ULTIMATE EDITION
 # ==========================================
 
-def generate_secret_message(personality_type: str) -> str:
-    """Generate a personal secret message"""
-    messages = {
-        "Rebel Learner": "The system doesn't break rebels. Rebels break the system. Keep questioning. You're doing it right. 🎸",
-        "Passionate Explorer": "Your curiosity isn't a distraction - it's a superpower. Follow it everywhere. The dots will connect later. 🔥",
-        "Practical Builder": "While others plan, you'll have already built three versions. Speed is your edge. Don't slow down for anyone. 🛠️",
-        "Thoughtful Analyst": "Your silence isn't weakness - it's data collection. When you speak, people listen. Remember that. 🧠",
-        "Adaptive Chameleon": "Being everything to everyone sounds exhausting. But being versatile in a rigid world? That's power. 🦎"
-    }
-    
-    for key in messages:
-        if key in personality_type:
-            return messages[key]
-    return "You showed up. You engaged. You're already ahead of 90% of people. Keep that energy. ⚡"
+# Canonical tag for each personality type: the lowercased type word found in its name
+_TYPE_RE = re.compile(r"Rebel|Explorer|Builder|Analyst|Chameleon")
 
-def generate_honest_take(personality: Dict, history: List[Dict]) -> str:
-    """Generate brutally honest but motivating take"""
-    personality_type = personality["type"]
-    
-    if "Rebel" in personality_type:
-        return """You're not just 'difficult' or 'stubborn' like some people might say. 
+_SECRET_MESSAGES = {
+    "rebel": "The system doesn't break rebels. Rebels break the system. Keep questioning. You're doing it right. 🎸",
+    "explorer": "Your curiosity isn't a distraction - it's a superpower. Follow it everywhere. The dots will connect later. 🔥",
+    "builder": "While others plan, you'll have already built three versions. Speed is your edge. Don't slow down for anyone. 🛠️",
+    "analyst": "Your silence isn't weakness - it's data collection. When you speak, people listen. Remember that. 🧠",
+    "chameleon": "Being everything to everyone sounds exhausting. But being versatile in a rigid world? That's power. 🦎",
+    "default": "You showed up. You engaged. You're already ahead of 90% of people. Keep that energy. ⚡"
+}
+
+_HONEST_TAKES = {
+    "rebel": """You're not just 'difficult' or 'stubborn' like some people might say. 
         You're wired to need the WHY before the HOW. That's not a bug - it's a feature. 
         Here's the thing though: your rebellion only matters if it builds something. Question everything, yes. But then CREATE something better. That's where your real power is.
-        The world needs people who challenge BS. Just make sure you're building while you're burning. 🔥"""
-        
-    elif "Explorer" in personality_type:
-        return """Your brain works like a web, not a line. You make connections others miss because you actually EXPLORE instead of just following the path.
+        The world needs people who challenge BS. Just make sure you're building while you're burning. 🔥""",
+    "explorer": """Your brain works like a web, not a line. You make connections others miss because you actually EXPLORE instead of just following the path.
         But real talk? Your biggest challenge isn't learning - it's FINISHING. You get 80% into something, get distracted by the next shiny thing, and jump ship.
-        The next level for you: Take ONE obsession and see it through to the end. Just one. Watch what happens. 🚀"""
-        
-    elif "Builder" in personality_type:
-        return """You learn by breaking things. By DOING, not reading. That's rare and valuable.
+        The next level for you: Take ONE obsession and see it through to the end. Just one. Watch what happens. 🚀""",
+    "builder": """You learn by breaking things. By DOING, not reading. That's rare and valuable.
         But here's your kryptonite: you sometimes build before you plan, and waste time rebuilding. I get it - planning feels like procrastination to you.
-        Try this: 5 minutes of thinking before 5 hours of building. That's it. You'll 10x your speed. Trust me. 🛠️"""
-        
-    elif "Analyst" in personality_type:
-        return """You process deep. You notice patterns others miss. Your insights are actually valuable - like, REALLY valuable.
-        But real talk? You hold back too much. You think "everyone probably already knows this" but THEY DON'T. Your next challenge: Share your observations more. Even if you think they're obvious. They're not. People need your perspective. 🧠"""
-        
-    else:
-        return """You adapt. You flow. You don't fit in boxes - and honestly? In 2026, that's exactly what the world needs.
+        Try this: 5 minutes of thinking before 5 hours of building. That's it. You'll 10x your speed. Trust me. 🛠️""",
+    "analyst": """You process deep. You notice patterns others miss. Your insights are actually valuable - like, REALLY valuable.
+        But real talk? You hold back too much. You think "everyone probably already knows this" but THEY DON'T. Your next challenge: Share your observations more. Even if you think they're obvious. They're not. People need your perspective. 🧠""",
+    "chameleon": """You adapt. You flow. You don't fit in boxes - and honestly? In 2026, that's exactly what the world needs.
         Your challenge: Don't adapt so much that you lose yourself. Stay fluid, but know your core. That's the balance.
         When you figure that out? You'll be unstoppable. 🦎"""
+}
+
+_PLOT_TWISTS = {
+    "rebel": "The things you rebel AGAINST reveal what you actually CARE about. Your resistance isn't negativity - it's passion pointing you toward what matters. Follow that.",
+    "explorer": "Your 'scattered interests' aren't random. There's a pattern. Look back at everything you've been obsessed with. The common thread? THAT's your real calling.",
+    "builder": "Every bug you've fixed, every error you've solved - those 'mistakes' taught you more than any tutorial ever could. You're not messy. You're learning optimally.",
+    "analyst": "That thing you do where you stay quiet and observe? People think you're shy. Reality: you're gathering data. That's strategic intelligence, not social anxiety.",
+    "chameleon": "Your ability to switch modes isn't inconsistency - it's range. Most people can play one note. You're an entire orchestra. Own it."
+}
+
+_FINAL_MOTIVATIONS = {
+    "rebel": """You're not here to follow rules. You're here to write new ones.
+        Don't waste your rebellion on small stuff. Save it for the things that actually matter.
+        Change the game. Don't just refuse to play it.
+        Now go break something worth breaking. 🎸""",
+    "explorer": """Your curiosity isn't a weakness. It's your compass.
+        Trust the weird paths. Connect the random dots. Build your own map.
+        The people who changed the world weren't following directions. They were following curiosity.
+        Go explore something new today. 🔥""",
+    "builder": """Stop watching tutorials. Stop planning perfection.
+        Start building. Start breaking. Start learning by DOING.
+        Your hands are your best teachers. Use them.
+        Now go build something. Anything. Today. 🛠️""",
+    "analyst": """Your quiet observations matter. Your patterns are valuable. Your insights are needed.
+        Stop waiting for the "perfect moment" to share them.
+        Share one insight this week. Just one. Watch what happens.
+        The world needs your perspective. Don't hide it. 🧠""",
+    "chameleon": """You don't fit in one box. Stop trying.
+        Your adaptability is your superpower in a world that won't stop changing.
+        Flow. Adapt. But never lose your core.
+        Now go be whoever you need to be today. 🦎"""
+}
+
+_TAGLINES = {
+    "rebel": "Questions everything. Builds something better. 🎸",
+    "explorer": "Connects dots others can't see. 🔥",
+    "builder": "Learns by doing. Fails fast. Wins faster. 🛠️",
+    "analyst": "Thinks deep. Sees patterns. Drops wisdom bombs. 🧠",
+    "chameleon": "Adapts to anything. Masters everything. 🦎",
+    "default": "Discovered by AI. Validated by reality. ⚡"
+}
+
+
+@functools.lru_cache(maxsize=16)
+def _personality_tag(personality_type: str) -> str:
+    """Normalize a personality type name to its canonical tag, or 'default' if none matches"""
+    match = _TYPE_RE.search(personality_type)
+    return match.group(0).lower() if match else "default"
+
+
+def generate_secret_message(personality_type: str) -> str:
+    """Generate a personal secret message"""
+    return _SECRET_MESSAGES[_personality_tag(personality_type)]
+
+def generate_honest_take(personality: Dict, history: List[Tuple[str, str]]) -> str:
+    """Generate brutally honest but motivating take"""
+    return _HONEST_TAKES.get(_personality_tag(personality["type"]), _HONEST_TAKES["chameleon"])
 
 def generate_plot_twist(personality_type: str) -> Dict:
     """Generate an unexpected insight"""
@@ -459,128 +684,63 @@ def generate_plot_twist(personality_type: str) -> Dict:
 
 def get_plot_twist_insight(personality_type: str) -> str:
     """Get specific plot twist based on personality"""
-    if "Rebel" in personality_type:
-        return "The things you rebel AGAINST reveal what you actually CARE about. Your resistance isn't negativity - it's passion pointing you toward what matters. Follow that."
-    elif "Explorer" in personality_type:
-        return "Your 'scattered interests' aren't random. There's a pattern. Look back at everything you've been obsessed with. The common thread? THAT's your real calling."
-    elif "Builder" in personality_type:
-        return "Every bug you've fixed, every error you've solved - those 'mistakes' taught you more than any tutorial ever could. You're not messy. You're learning optimally."
-    elif "Analyst" in personality_type:
-        return "That thing you do where you stay quiet and observe? People think you're shy. Reality: you're gathering data. That's strategic intelligence, not social anxiety."
-    else:
-        return "Your ability to switch modes isn't inconsistency - it's range. Most people can play one note. You're an entire orchestra. Own it."
+    return _PLOT_TWISTS.get(_personality_tag(personality_type), _PLOT_TWISTS["chameleon"])
 
 def generate_final_motivation(personality_type: str) -> str:
     """Generate personalized final motivation"""
-    if "Rebel" in personality_type:
-        return """You're not here to follow rules. You're here to write new ones.
-        Don't waste your rebellion on small stuff. Save it for the things that actually matter.
-        Change the game. Don't just refuse to play it.
-        Now go break something worth breaking. 🎸"""
-    elif "Explorer" in personality_type:
-        return """Your curiosity isn't a weakness. It's your compass.
-        Trust the weird paths. Connect the random dots. Build your own map.
-        The people who changed the world weren't following directions. They were following curiosity.
-        Go explore something new today. 🔥"""
-    elif "Builder" in personality_type:
-        return """Stop watching tutorials. Stop planning perfection.
-        Start building. Start breaking. Start learning by DOING.
-        Your hands are your best teachers. Use them.
-        Now go build something. Anything. Today. 🛠️"""
-    elif "Analyst" in personality_type:
-        return """Your quiet observations matter. Your patterns are valuable. Your insights are needed.
-        Stop waiting for the "perfect moment" to share them.
-        Share one insight this week. Just one. Watch what happens.
-        The world needs your perspective. Don't hide it. 🧠"""
-    else:
-        return """You don't fit in one box. Stop trying.
-        Your adaptability is your superpower in a world that won't stop changing.
-        Flow. Adapt. But never lose your core.
-        Now go be whoever you need to be today. 🦎"""
+    return _FINAL_MOTIVATIONS.get(_personality_tag(personality_type), _FINAL_MOTIVATIONS["chameleon"])
 
 def generate_tagline(personality_type: str) -> str:
     """Generate shareable tagline"""
-    taglines = {
-        "Rebel": "Questions everything. Builds something better. 🎸",
-        "Explorer": "Connects dots others can't see. 🔥",
-        "Builder": "Learns by doing. Fails fast. Wins faster. 🛠️",
-        "Analyst": "Thinks deep. Sees patterns. Drops wisdom bombs. 🧠",
-        "Chameleon": "Adapts to anything. Masters everything. 🦎"
-    }
-    
-    for key in taglines:
-        if key in personality_type:
-            return taglines[key]
-    return "Discovered by AI. Validated by reality. ⚡"
+    return _TAGLINES[_personality_tag(personality_type)]
 
 
-class ConversationManager:
-    """Ultimate conversation manager with psychological depth"""
-    
-    def __init__(self):
-        self.conversation_history: List[Dict[str, str]] = []
-        self.follow_up_count = 0
-        self.max_follow_ups = 3
-        self.user_emotions: List[Tuple[str, str, str]] = []
-        self.detected_patterns: List[str] = []
-    
-    def extract_keywords(self, text: str) -> List[str]:
-        """Extract meaningful keywords"""
-        cleaned_text = re.sub(r'[^\w\s]', '', text.lower())
-        
-        stop_words = {
-            'i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves',
-            'you', 'your', 'yours', 'yourself', 'yourselves', 'he', 'him',
-            'his', 'himself', 'she', 'her', 'hers', 'herself', 'it', 'its',
-            'itself', 'they', 'them', 'their', 'theirs', 'themselves',
-            'what', 'which', 'who', 'whom', 'this', 'that', 'these', 'those',
-            'am', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
-            'have', 'has', 'had', 'having', 'do', 'does', 'did', 'doing',
-            'a', 'an', 'the', 'and', 'but', 'if', 'or', 'because', 'as',
-            'until', 'while', 'of', 'at', 'by', 'for', 'with', 'about',
-            'against', 'between', 'into', 'through', 'during', 'before',
-            'after', 'above', 'below', 'to', 'from', 'up', 'down', 'in',
-            'out', 'on', 'off', 'over', 'under', 'again', 'further',
-            'then', 'once', 'just', 'very', 'really'
-        }
-        
-        words = cleaned_text.split()
-        keywords = [word for word in words if word not in stop_words and len(word) > 2]
-        keywords.sort(key=len, reverse=True)
-        return keywords[:3] if keywords else words[:2]
-    
-    def generate_follow_up_question(self, user_input: str) -> str:
-        """
-        Generate MIND-BENDING, PERSONAL, CREATIVE follow-up questions
-        Research-backed psychological engagement
-        """
-        try:
-            # Detect emotion with full context
-            emotion, emoji, description, intensity = EmotionDetector.detect_emotion(user_input)
-            self.user_emotions.append((emotion, description, intensity))
-            
-            # Extract keywords
-            keywords = self.extract_keywords(user_input)
-            if not keywords:
-                keywords = user_input.split()[:2]
-            keyword_to_use = keywords[0] if keywords else "that"
-            
-            # Build rich conversation context
-            context = "\n".join([
-                f"User: {msg['user']}\nAI: {msg['ai']}" 
-                for msg in self.conversation_history
-            ])
-            
-            # Get psychological trigger based on question number
-            if self.follow_up_count == 0:
-                trigger_style = "curiosity_opener"
-            elif self.follow_up_count == 1:
-                trigger_style = "pattern_interrupt"
-            else:
-                trigger_style = "deep_dive"
-            
-            # ULTIMATE CREATIVE PROMPT
-            prompt = f"""You are an AI with a UNIQUE personality - think of yourself as that one friend who:
+# Keyword extraction constants, built once instead of on every user turn
+_PUNCT_RE = re.compile(r'[^\w\s]')
+# The same deletion for ASCII text as a str.translate table, derived from the regex so the two always agree
+_ASCII_PUNCT_TABLE = str.maketrans('', '', ''.join(c for c in map(chr, range(128)) if _PUNCT_RE.match(c)))
+
+_STOP_WORDS = frozenset({
+    'i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves',
+    'you', 'your', 'yours', 'yourself', 'yourselves', 'he', 'him',
+    'his', 'himself', 'she', 'her', 'hers', 'herself', 'it', 'its',
+    'itself', 'they', 'them', 'their', 'theirs', 'themselves',
+    'what', 'which', 'who', 'whom', 'this', 'that', 'these', 'those',
+    'am', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
+    'have', 'has', 'had', 'having', 'do', 'does', 'did', 'doing',
+    'a', 'an', 'the', 'and', 'but', 'if', 'or', 'because', 'as',
+    'until', 'while', 'of', 'at', 'by', 'for', 'with', 'about',
+    'against', 'between', 'into', 'through', 'during', 'before',
+    'after', 'above', 'below', 'to', 'from', 'up', 'down', 'in',
+    'out', 'on', 'off', 'over', 'under', 'again', 'further',
+    'then', 'once', 'just', 'very', 'really'
+})
+
+
+@functools.lru_cache(maxsize=512)
+def _keyword_re(keyword: str) -> re.Pattern:
+    """Case-insensitive whole-word matcher for a keyword ("cat" must not match "catalog")"""
+    return re.compile(rf'(?<!\w){re.escape(keyword)}(?!\w)', re.IGNORECASE)
+
+
+def _clean_words(text: str) -> List[str]:
+    """Lowercase a message, drop punctuation and split it into words"""
+    text_lower = text.lower()
+    # ASCII input (the common case) is cleaned by one translate call; the regex handles Unicode punctuation and emoji
+    if text_lower.isascii():
+        return text_lower.translate(_ASCII_PUNCT_TABLE).split()
+    return _PUNCT_RE.sub('', text_lower).split()
+
+
+def _content_words(text: str) -> frozenset:
+    """Words of a message that can become keywords (no stop words, longer than two letters)"""
+    return frozenset(word for word in _clean_words(text) if word not in _STOP_WORDS and len(word) > 2)
+
+
+# Follow-up prompt pieces. The head and mission blocks are constant, and only the
+# mission for the current trigger style is sent, not all three.
+# Per-turn values use $placeholders so they are filled by string.Template.
+_PROMPT_HEAD = """You are an AI with a UNIQUE personality - think of yourself as that one friend who:
 - Asks questions that make people go "Damn, I never thought about it that way"
 - Notices what people REALLY mean, not just what they say
 - Challenges assumptions playfully (not aggressively)
@@ -588,41 +748,46 @@ class ConversationManager:
 - Makes conversations memorable, not formulaic
 
 🎯 CURRENT SITUATION:
-Question #{self.follow_up_count + 1} of {self.max_follow_ups}
+Question #$number of $total
 
 Previous conversation:
-{context if context else "This is your first question. Make it count."}
+$context
 
-User just said: "{user_input}"
+User just said: "$user_input"
 
-Emotional context: They're {description} ({intensity}) {emoji}
+Emotional context: They're $description ($intensity) $emoji
 
 🧠 PSYCHOLOGICAL CONTEXT:
-- Trigger style for this question: {trigger_style}
-- Keyword to naturally include: "{keyword_to_use}"
-- Their emotion pattern: {"passionate/intense" if intensity == "intense" else "measured/thoughtful"}
+- Trigger style for this question: $trigger_style
+- Keyword to naturally include: "$keyword"
+- Their emotion pattern: $intensity_hint
 
 🎨 YOUR MISSION:
-Based on the trigger style "{trigger_style}", create a question that:
+Based on the trigger style "$trigger_style", create a question that:
+
+"""
 
-If CURIOSITY_OPENER:
-- Start with something that makes them lean in ("Wait, that's interesting because...")
+_MISSION_BLOCKS = {
+    "curiosity_opener": """- Start with something that makes them lean in ("Wait, that's interesting because...")
 - Tease a perspective they haven't considered
 - Make them WANT to answer to hear your insight
 
-If PATTERN_INTERRUPT:
-- Do something unexpected ("Hold up..." or "Okay, controversial question...")
+""",
+    "pattern_interrupt": """- Do something unexpected ("Hold up..." or "Okay, controversial question...")
 - Challenge a subtle assumption they made
 - Make them pause and re-think
 
-If DEEP_DIVE:
-- Get philosophical/personal
+""",
+    "deep_dive": """- Get philosophical/personal
 - Ask them to imagine scenarios
 - Connect their answer to their identity/future
 
-🔥 YOUR PERSONALITY RULES:
-1. React to their EMOTION first (acknowledge the {description} vibe)
-2. Use their EXACT words (especially "{keyword_to_use}")
+"""
+}
+
+_PROMPT_TAIL = """🔥 YOUR PERSONALITY RULES:
+1. React to their EMOTION first (acknowledge the $description vibe)
+2. Use their EXACT words (especially "$keyword")
 3. Ask something that triggers curiosity or self-reflection
 4. Use 1-2 emojis MAX (don't overdo it)
 5. Keep it 1-2 sentences - short but POWERFUL
@@ -642,9 +807,9 @@ GOOD (creative, engaging):
 "Stressed but still showing up? 💪 What's the ONE thing keeping you in the game when quitting sounds so much easier?"
 
 🎯 CRITICAL REQUIREMENTS:
-- MUST include the word "{keyword_to_use}" naturally in your question
-- MUST match the emotional intensity (they're {intensity} right now)
-- MUST use the {trigger_style} approach
+- MUST include the word "$keyword" naturally in your question
+- MUST match the emotional intensity (they're $intensity right now)
+- MUST use the $trigger_style approach
 - NO therapy speak ("How does that make you feel?")
 - NO obvious/predictable questions
 - YES to making them think differently
@@ -652,53 +817,327 @@ GOOD (creative, engaging):
 
 Generate your creative, mind-bending follow-up question NOW:"""
 
-            # Call Gemini AI
-            if 'model' in globals():
-                response = model.generate_content(prompt)
-                follow_up_question = response.text.strip()
-                follow_up_question = follow_up_question.strip('"').strip("'").strip('`')
-            else:
-                # Fallback if model isn't initialized
-                raise Exception("Model not initialized")
+# Trigger style for each question number; later questions stay on the last one
+_TRIGGER_STYLES = ("curiosity_opener", "pattern_interrupt", "deep_dive")
+
+# Templated question per trigger style, used when Gemini is skipped or misses the keyword
+_FALLBACK_QUESTIONS = {
+    "curiosity_opener": "Wait, you said '{keyword}' - that word caught my attention. What's the story behind choosing THAT word? 🤔",
+    "pattern_interrupt": "Hold up. Let me challenge '{keyword}' for a second - what if it's not what you think it is? 😏",
+    "deep_dive": "If '{keyword}' was a person sitting across from you right now, what would you say to them? 💭"
+}
+
+# How the emotion pattern is described to the model, by intensity
+_INTENSITY_PHRASE = {"intense": "passionate/intense"}
+
+# One pre-assembled template per trigger style
+_FOLLOW_UP_TEMPLATES = {
+    trigger_style: Template(_PROMPT_HEAD + mission + _PROMPT_TAIL)
+    for trigger_style, mission in _MISSION_BLOCKS.items()
+}
+
+
+# LRU of Gemini follow-ups keyed by (trigger_style, keyword, emotion, intensity, context digest, normalized user_input).
+# Later prompts quote the earlier answers, so the context digest keeps one user's history out of another's question.
+_FOLLOW_UP_CACHE: "OrderedDict[Tuple[str, ...], str]" = OrderedDict()
+_FOLLOW_UP_CACHE_SIZE = 512
+
+
+def _follow_up_cache_get(key: Tuple[str, ...]) -> Optional[str]:
+    """Return a cached follow-up and mark it most recently used"""
+    question = _FOLLOW_UP_CACHE.get(key)
+    if question is not None:
+        _FOLLOW_UP_CACHE.move_to_end(key)
+    return question
+
+
+def _follow_up_cache_put(key: Tuple[str, ...], question: str):
+    """Store a follow-up, evicting the least recently used entry when full"""
+    _FOLLOW_UP_CACHE[key] = question
+    _FOLLOW_UP_CACHE.move_to_end(key)
+    if len(_FOLLOW_UP_CACHE) > _FOLLOW_UP_CACHE_SIZE:
+        _FOLLOW_UP_CACHE.popitem(last=False)
+
+
+# Second tier for near-duplicate inputs. Embeddings are bucketed by (trigger_style, keyword, emotion, intensity, context digest):
+# the question has to contain the keyword anyway, "love X" never matches "hate X", and only a handful of vectors get compared.
+# The context digest limits sharing to turns with the same history (in practice the first question), and an entry is only reused
+# when every content word of the input it was generated for also appears in the new input.
+_EMBEDDING_MODEL = "models/text-embedding-004"
+_SEMANTIC_THRESHOLD = 0.92
+_SEMANTIC_CACHE: "OrderedDict[Tuple[str, ...], List[Tuple[array, frozenset, str]]]" = OrderedDict()
+_SEMANTIC_CACHE_SIZE = 256
+_SEMANTIC_BUCKET_SIZE = 8
+# Longest the reply waits on the embedding; a slower lookup counts as a miss so Gemini keeps the rest of the deadline
+_SEMANTIC_LOOKUP_SECONDS = 0.5
+
+# Embedding tasks still running; held here so they aren't garbage collected before they finish
+_EMBEDDING_TASKS: Set[asyncio.Task] = set()
+
+
+async def embed_user_input(text: str) -> Optional[array]:
+    """Unit-length embedding of a user message, or None if the embedding call fails"""
+    try:
+        result = await asyncio.wait_for(
+            asyncio.to_thread(genai.embed_content, model=_EMBEDDING_MODEL, content=text, task_type="semantic_similarity"),
+            timeout=GEMINI_TIMEOUT_SECONDS
+        )
+    except Exception as e:
+        logger.warning("⚠️ Embedding failed, skipping semantic cache: %s", e)
+        return None
+    values = result["embedding"]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return array('f', (v / norm for v in values))
+
+
+def start_embedding(text: str) -> asyncio.Task:
+    """Start embedding a user message in the background"""
+    task = asyncio.create_task(embed_user_input(text))
+    _EMBEDDING_TASKS.add(task)
+    task.add_done_callback(_EMBEDDING_TASKS.discard)
+    return task
+
+
+def _semantic_candidates(bucket_key: Tuple[str, ...], words: frozenset) -> List[Tuple[array, str]]:
+    """Cached (embedding, follow-up) pairs in this bucket that were built only from words in this input"""
+    bucket = _SEMANTIC_CACHE.get(bucket_key)
+    if not bucket:
+        return []
+    _SEMANTIC_CACHE.move_to_end(bucket_key)
+    return [(cached, question) for cached, cached_words, question in bucket if cached_words <= words]
+
+
+def _semantic_match(candidates: List[Tuple[array, str]], embedding: array) -> Optional[str]:
+    """Return the closest candidate follow-up, if it clears the similarity threshold"""
+    # Vectors are unit length, so the dot product is the cosine similarity
+    similarity, question = max(
+        ((sum(map(operator.mul, embedding, cached)), question) for cached, question in candidates),
+        key=operator.itemgetter(0),
+        default=(0.0, None)
+    )
+    return question if similarity >= _SEMANTIC_THRESHOLD else None
+
+
+def _semantic_cache_put(bucket_key: Tuple[str, ...], embedding: array, words: frozenset, question: str):
+    """Store a follow-up under its bucket, dropping the oldest entry or bucket when full"""
+    bucket = _SEMANTIC_CACHE.setdefault(bucket_key, [])
+    bucket.append((embedding, words, question))
+    if len(bucket) > _SEMANTIC_BUCKET_SIZE:
+        del bucket[0]
+    _SEMANTIC_CACHE.move_to_end(bucket_key)
+    if len(_SEMANTIC_CACHE) > _SEMANTIC_CACHE_SIZE:
+        _SEMANTIC_CACHE.popitem(last=False)
+
+
+def _semantic_cache_put_when_embedded(embedding_task: asyncio.Task, bucket_key: Tuple[str, ...], words: frozenset, question: str):
+    """Store a follow-up once its embedding arrives, without holding up the reply"""
+    def store(task: asyncio.Task):
+        if not task.cancelled() and task.result() is not None:
+            _semantic_cache_put(bucket_key, task.result(), words, question)
+    embedding_task.add_done_callback(store)
+
+
+async def stream_follow_up(prompt: str, on_chunk: Callable[[str], Awaitable[None]]) -> str:
+    """Stream a follow-up from Gemini, forwarding each text chunk as it arrives, and return the full text"""
+    response = await get_model().generate_content_async(prompt, generation_config=_FOLLOW_UP_GEN_CONFIG, stream=True)
+    pieces = []
+    async for chunk in response:
+        # Trailing chunks can carry only the finish reason
+        text = "".join(part.text for part in chunk.parts) if chunk.candidates else ""
+        if text:
+            pieces.append(text)
+            await on_chunk(text)
+    return "".join(pieces)
+
+
+# Rate-limited calls are retried with exponential backoff: 0.25s, then 0.5s
+_GEMINI_ATTEMPTS = 3
+
+
+async def request_follow_up(prompt: str, on_chunk: Optional[Callable[[str], Awaitable[None]]] = None) -> str:
+    """Ask Gemini for a follow-up (streamed through on_chunk when given), retrying while rate limited"""
+    # Once a chunk reached the client a retry would append to the partial question, so only retry untouched streams
+    forwarded = False
+    
+    async def forward(text: str):
+        nonlocal forwarded
+        forwarded = True
+        await on_chunk(text)
+    
+    for attempt in range(_GEMINI_ATTEMPTS):
+        try:
+            if on_chunk is None:
+                response = await get_model().generate_content_async(prompt, generation_config=_FOLLOW_UP_GEN_CONFIG)
+                return response.text
+            return await stream_follow_up(prompt, forward)
+        except google_exceptions.ResourceExhausted:
+            if forwarded or attempt == _GEMINI_ATTEMPTS - 1:
+                raise
+            logger.warning("⏳ Gemini rate limited, retrying (attempt %d)", attempt + 2)
+            await asyncio.sleep(0.25 * 2 ** attempt)
+
+
+# Exchanges included in the follow-up prompt's conversation context
+MAX_CONTEXT_TURNS = 10
+
+
+class ConversationManager:
+    """Ultimate conversation manager with psychological depth"""
+    
+    # Fixed attribute set: no per-instance __dict__ for the (pooled) session objects
+    __slots__ = (
+        "user_turns", "ai_questions", "follow_up_count", "max_follow_ups", "user_emotions",
+        "detected_patterns", "stats", "_bonus_cache", "_context_chunks"
+    )
+    
+    def __init__(self):
+        # What the user said and what we asked back; the user can be one turn ahead once the last answer is in
+        self.user_turns: List[str] = []
+        self.ai_questions: List[str] = []
+        self.follow_up_count = 0
+        self.max_follow_ups = 3
+        self.user_emotions: List[Tuple[str, str, str]] = []
+        self.detected_patterns: List[str] = []
+        self.stats = SessionStats()
+        self._bonus_cache: Optional[Dict] = None
+        # Prompt context lines, appended once per turn instead of rebuilt from history.
+        # Only the latest exchanges are kept so prompt size stays bounded however long a session runs.
+        self._context_chunks: Deque[str] = deque(maxlen=MAX_CONTEXT_TURNS)
+    
+    @property
+    def conversation_history(self) -> List[Tuple[str, str]]:
+        """(user, ai) pairs in the shape the analyzers expect"""
+        return list(itertools.zip_longest(self.user_turns, self.ai_questions, fillvalue=""))
+    
+    def extract_keywords(self, text: str) -> List[str]:
+        """Extract meaningful keywords"""
+        words = _clean_words(text)
+        # Filter and pick the three longest in one pass, no full sort
+        keywords = heapq.nlargest(3, (word for word in words if word not in _STOP_WORDS and len(word) > 2), key=len)
+        return keywords if keywords else words[:2]
+    
+    async def generate_follow_up_question(self, user_input: str, on_chunk: Optional[Callable[[str], Awaitable[None]]] = None) -> str:
+        """
+        Generate MIND-BENDING, PERSONAL, CREATIVE follow-up questions
+        Research-backed psychological engagement
+        With on_chunk, Gemini output is streamed through it while the question is generated
+        """
+        keywords = []
+        try:
+            # Detect emotion with full context
+            emotion, emoji, description, intensity = EmotionDetector.detect_emotion(user_input)
+            self.user_emotions.append((emotion, description, intensity))
             
-            # Validation with creative fallback
-            if keyword_to_use.lower() not in follow_up_question.lower():
-                # Creative fallbacks based on trigger style
-                if trigger_style == "curiosity_opener":
-                    follow_up_question = f"Wait, you said '{keyword_to_use}' - that word caught my attention. What's the story behind choosing THAT word? 🤔"
-                elif trigger_style == "pattern_interrupt":
-                    follow_up_question = f"Hold up. Let me challenge '{keyword_to_use}' for a second - what if it's not what you think it is? 😏"
+            # Extract keywords
+            keywords = self.extract_keywords(user_input)
+            if not keywords:
+                keywords = user_input.split()[:2]
+            keyword_to_use = keywords[0] if keywords else "that"
+            
+            # Build rich conversation context
+            context = "\n".join(self._context_chunks)
+            
+            # Get psychological trigger based on question number
+            trigger_style = _TRIGGER_STYLES[min(self.follow_up_count, len(_TRIGGER_STYLES) - 1)]
+            
+            # Too little to work with (a couple of words, or only stop words): skip Gemini entirely
+            if len(user_input.split()) < 3 or keyword_to_use in _STOP_WORDS or len(keyword_to_use) < 3:
+                follow_up_question = _FALLBACK_QUESTIONS[trigger_style].format(keyword=keyword_to_use)
+                logger.info("⚡ Templated %s question #%d for short input: %s", trigger_style, self.follow_up_count + 1, follow_up_question)
+                return follow_up_question
+            
+            # ULTIMATE CREATIVE PROMPT
+            prompt = _FOLLOW_UP_TEMPLATES[trigger_style].substitute(
+                number=self.follow_up_count + 1,
+                total=self.max_follow_ups,
+                context=context if context else "This is your first question. Make it count.",
+                user_input=user_input,
+                description=description,
+                intensity=intensity,
+                emoji=emoji,
+                trigger_style=trigger_style,
+                keyword=keyword_to_use,
+                intensity_hint=_INTENSITY_PHRASE.get(intensity, "measured/thoughtful")
+            )
+
+            # Call Gemini AI, unless this turn (or a near-duplicate of it) was already answered
+            context_digest = hashlib.blake2b(context.encode(), digest_size=16).hexdigest()
+            cache_key = (trigger_style, keyword_to_use, emotion, intensity, context_digest, user_input.lower().strip())
+            follow_up_question = _follow_up_cache_get(cache_key)
+            if follow_up_question is None:
+                if GEMINI_API_KEY:
+                    # One deadline covers the semantic lookup and every Gemini retry
+                    loop = asyncio.get_running_loop()
+                    deadline = loop.time() + GEMINI_TIMEOUT_SECONDS
+                    bucket_key = cache_key[:5]
+                    words = _content_words(user_input)
+                    embedding_task = start_embedding(user_input)
+                    
+                    # The embedding is only awaited up front when a cached entry could actually be reused
+                    candidates = _semantic_candidates(bucket_key, words)
+                    if candidates:
+                        try:
+                            embedding = await asyncio.wait_for(asyncio.shield(embedding_task), timeout=_SEMANTIC_LOOKUP_SECONDS)
+                        except asyncio.TimeoutError:
+                            embedding = None
+                        if embedding is not None:
+                            follow_up_question = _semantic_match(candidates, embedding)
+                    
+                    if follow_up_question is None:
+                        follow_up_question = await asyncio.wait_for(
+                            request_follow_up(prompt, on_chunk),
+                            timeout=deadline - loop.time()
+                        )
+                        follow_up_question = follow_up_question.strip()
+                        # Drop one matching pair of wrapping quotes, leaving quotes inside the question alone
+                        if len(follow_up_question) >= 2 and follow_up_question[0] == follow_up_question[-1] and follow_up_question[0] in '"\'`':
+                            follow_up_question = follow_up_question[1:-1]
+                        _semantic_cache_put_when_embedded(embedding_task, bucket_key, words, follow_up_question)
+                    _follow_up_cache_put(cache_key, follow_up_question)
                 else:
-                    follow_up_question = f"If '{keyword_to_use}' was a person sitting across from you right now, what would you say to them? 💭"
+                    # Fallback if model isn't initialized
+                    raise Exception("Model not initialized")
             
-            logger.info(f"✅ Generated {trigger_style} question #{self.follow_up_count + 1}: {follow_up_question}")
+            # Validation with creative fallback
+            if not _keyword_re(keyword_to_use).search(follow_up_question):
+                follow_up_question = _FALLBACK_QUESTIONS[trigger_style].format(keyword=keyword_to_use)
+            
+            logger.info("✅ Generated %s question #%d: %s", trigger_style, self.follow_up_count + 1, follow_up_question)
             return follow_up_question
             
+        except asyncio.TimeoutError:
+            logger.warning("⏱️ Gemini took longer than %ss, using fallback question", GEMINI_TIMEOUT_SECONDS)
+            keyword = keywords[0] if keywords else "that"
+            return f"Hmm, '{keyword}' stuck with me. Tell me more? 🤔"
         except Exception as e:
-            logger.error(f"❌ Error generating follow-up: {str(e)}")
+            logger.error("❌ Error generating follow-up: %s", e)
             keyword = keywords[0] if keywords else "that"
             return f"Hmm, '{keyword}' stuck with me. Tell me more? 🤔"
     
     def add_to_history(self, user_message: str, ai_response: str):
-        """Add interaction to history"""
-        self.conversation_history.append({
-            "user": user_message,
-            "ai": ai_response
-        })
-    
-    def increment_follow_up(self):
-        """Increment counter"""
+        """Add interaction to history and count the follow-up"""
+        self.add_user_turn(user_message)
+        self.ai_questions.append(ai_response)
+        self._context_chunks.append(f"User: {user_message}\nAI: {ai_response}")
         self.follow_up_count += 1
     
+    def add_user_turn(self, user_message: str):
+        """Record a user message that gets no follow-up (the final answer)"""
+        self.user_turns.append(user_message)
+        PersonalityAnalyzer.update_stats(self.stats, user_message)
+        self._bonus_cache = None
+    
     def is_complete(self) -> bool:
         """Check if complete"""
         return self.follow_up_count >= self.max_follow_ups
     
     def get_ultimate_bonus_package(self) -> Dict[str, any]:
-        """Generate the ULTIMATE bonus experience"""
+        """Generate the ULTIMATE bonus experience (computed once per conversation)"""
+        if self._bonus_cache is not None:
+            return self._bonus_cache
         
         # Personality analysis
-        personality = PersonalityAnalyzer.analyze_conversation(self.conversation_history)
+        personality = PersonalityAnalyzer.analyze_conversation(self.conversation_history, self.stats)
         
         # Mind reading game
         mind_reading = InteractiveBonusGenerator.generate_mind_reading_game(self.conversation_history)
@@ -709,148 +1148,274 @@ Generate your creative, mind-bending follow-up question NOW:"""
         # Personal challenge
         personal_challenge = InteractiveBonusGenerator.generate_personal_challenge(personality)
         
-        return {
+        self._bonus_cache = {
             "personality": personality,
             "mind_reading": mind_reading,
             "future_vision": future_vision,
             "personal_challenge": personal_challenge
         }
+        return self._bonus_cache
     
     def reset(self):
         """Reset state"""
-        self.conversation_history.clear()
+        self.user_turns.clear()
+        self.ai_questions.clear()
         self.follow_up_count = 0
         self.user_emotions.clear()
         self.detected_patterns.clear()
+        self.stats = SessionStats()
+        self._bonus_cache = None
+        self._context_chunks.clear()
+
+
+# Constant responses, serialized once at import
+_ROOT_RESPONSE_BYTES = orjson.dumps({
+    "status": "active",
+    "message": "Acadza Ultimate AI - The conversation you'll remember 🚀",
+    "version": "3.0.0",
+    "model": GEMINI_MODEL_NAME,
+    "powered_by": "Aman Raj - Built with 2026 AI research",
+    "features": ["Psychological triggers", "Deep personalization", "Mind games", "Future predictions"]
+})
+
+_RESPECTFUL_ENDING_FRAME = orjson.dumps({
+    "type": "respectful_ending",
+    "data": {
+        "message": "Respect. Not everyone wants the full deep-dive. 😌",
+        "fun_fact": "You chose to skip, which actually tells me you're either:\na) Confident in yourself already, or\nb) Prefer to discover things your own way\n\nEither way? That's cool. 💪",
+        "final_words": "Keep being you. The world needs more people who know when to say 'enough'. ✌️",
+        "cta": "Start Over"
+    }
+}).decode()
+
+# Everything in the finale after its per-session stats
+_FINALE_STATIC = MappingProxyType({
+    "achievement": {
+        "title": "🏆 Achievement Unlocked",
+        "name": "Self-Discovery Hero",
+        "description": "Completed the conversation and discovered something about yourself"
+    },
+    "easter_egg": "P.S. Most people skip the detailed answers. You didn't. That says something about you. 😏",
+    "cta": {
+        "primary": "Start Over (Try Different Answers)",
+        "secondary": "Share Your Results"
+    }
+})
+
+
+# Constant phases of the completion reveal, pre-encoded as (delay, JSON text)
+_REVEAL_INTRO_PHASES = tuple((delay, orjson.dumps(frame).decode()) for delay, frame in (
+    # PHASE 1: Initial thank you
+    (0, {
+        "type": "complete",
+        "message": "Thanks, we have got your data."
+    }),
+    # PHASE 2: Wait message (small pause for dramatic effect)
+    (1.5, {
+        "type": "thinking",
+        "message": "Wait..."
+    }),
+    # PHASE 3: Processing message
+    (1, {
+        "type": "thinking",
+        "message": "I'm analyzing what you just told me... 🤔"
+    }),
+    # PHASE 4: Revelation
+    (2, {
+        "type": "thinking",
+        "message": "Okay, I think I figured you out. This is scary accurate... 👀"
+    })
+))
+
+_INTERACTIVE_CHOICE_FRAME = orjson.dumps({
+    "type": "interactive_choice",
+    "data": {
+        "title": "⚡ One More Thing...",
+        "question": "Want to see what I REALLY think about you?",
+        "subtitle": "(This part might surprise you)",
+        "options": [
+            {"id": "reveal", "text": "Show me 👀", "emoji": "🔥"},
+            {"id": "skip", "text": "Nah, I'm good", "emoji": "😌"}
+        ]
+    }
+}).decode()
+
+
+# Free list of reset ConversationManagers, reused across sessions instead of reallocated
+_CONVERSATION_POOL: "asyncio.Queue[ConversationManager]" = asyncio.Queue(maxsize=128)
+
+# Longest user message we process (the UI caps input at 500); raw frames are bounded by ws_max_size in uvicorn.run
+MAX_MESSAGE_CHARS = 4096
 
 
 @app.get("/")
 async def root():
     """Health check"""
-    return {
-        "status": "active",
-        "message": "Acadza Ultimate AI - The conversation you'll remember 🚀",
-        "version": "3.0.0",
-        "model": "gemini-2.5-flash",
-        "powered_by": "Aman Raj - Built with 2026 AI research",
-        "features": ["Psychological triggers", "Deep personalization", "Mind games", "Future predictions"]
-    }
+    return Response(content=_ROOT_RESPONSE_BYTES, media_type="application/json")
+
+
+# orjson-encoded static fields of the personality_reveal frame, keyed by personality type
+_REVEAL_STATIC_JSON: Dict[str, bytes] = {}
+
+
+def encode_personality_reveal(bonus_package: Dict) -> str:
+    """Serialize the personality_reveal frame, reusing the pre-encoded static fields of each type"""
+    personality = bonus_package["personality"]
+    static_json = _REVEAL_STATIC_JSON.get(personality["type"])
+    if static_json is None:
+        static_json = orjson.dumps({
+            "title": "🎯 PERSONALITY UNLOCKED",
+            "subtitle": "After analyzing your responses, I think you're...",
+            "personality_type": personality["type"],
+            "traits": personality["traits"],
+            "description": personality["description"],
+            "advice": personality["advice"],
+            "prediction": personality["prediction"],
+            "secret_strength": personality["secret_strength"],
+            "challenge": personality["challenge"],
+            "would_succeed_at": personality["would_succeed_at"]
+        })[1:-1]
+        _REVEAL_STATIC_JSON[personality["type"]] = static_json
+    
+    # Only the scores and bonus games are encoded per session
+    return b"".join((
+        b'{"type":"personality_reveal","bonus":{', static_json,
+        b',"scores":{"engagement":%d,"honesty":%d}' % (personality["engagement_score"], personality["honesty_level"]),
+        b',"mind_reading":', orjson.dumps(bonus_package["mind_reading"]),
+        b',"future_vision":', orjson.dumps(bonus_package["future_vision"]),
+        b',"personal_challenge":', orjson.dumps(bonus_package["personal_challenge"]),
+        b'}}'
+    )).decode()
+
+
+def encode_follow_up(question: str, number: int, total: int) -> str:
+    """Serialize a follow_up frame; only the question goes through the encoder, the envelope is fixed text"""
+    return '{"type":"follow_up","question":%s,"number":%d,"total":%d}' % (orjson.dumps(question).decode(), number, total)
+
+
+def encode_reveal_sequence(frames: List[Tuple[float, Union[Dict, str]]]) -> str:
+    """
+    Pack (delay, payload) frames into a single reveal_sequence frame.
+    Each phase carries the original frame plus display_after_ms, counted from the previous phase,
+    so the client schedules the reveal instead of the server sleeping between sends.
+    Payloads are dicts or pre-serialized JSON text.
+    """
+    phases = []
+    for delay, payload in frames:
+        frame_json = payload if isinstance(payload, str) else orjson.dumps(payload).decode()
+        phases.append('{"display_after_ms":%d,"frame":%s}' % (round(delay * 1000), frame_json))
+    return '{"type":"reveal_sequence","phases":[' + ",".join(phases) + ']}'
+
+
+async def send_json_fast(websocket: WebSocket, payload: Dict):
+    """Send a frame serialized with orjson, as text so the browser's JSON.parse keeps working"""
+    await websocket.send_text(orjson.dumps(payload).decode())
+
+
+async def write_frames(websocket: WebSocket, outbound: "asyncio.Queue[Union[Dict, str, None]]"):
+    """
+    Send queued frames (dicts or pre-encoded JSON text) in order until a None sentinel.
+    Back-to-back follow_up_chunk frames that piled up during a send are merged into one.
+    """
+    pending = await outbound.get()
+    while pending is not None:
+        # A frame dequeued while merging (possibly the None sentinel) is carried over here
+        payload, have_pending = pending, False
+        
+        if isinstance(payload, dict) and payload["type"] == "follow_up_chunk":
+            text = payload["text"]
+            while not outbound.empty():
+                queued = outbound.get_nowait()
+                if not (isinstance(queued, dict) and queued["type"] == "follow_up_chunk"):
+                    pending, have_pending = queued, True
+                    break
+                text += queued["text"]
+            payload = {"type": "follow_up_chunk", "text": text}
+        
+        if isinstance(payload, str):
+            await websocket.send_text(payload)
+        else:
+            await send_json_fast(websocket, payload)
+        
+        if not have_pending:
+            pending = await outbound.get()
 
 
-@app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """
     ULTIMATE WebSocket endpoint
     Research-backed psychological engagement + creative AI
     """
     await websocket.accept()
+    session_rng.set(random.Random(os.urandom(8)))
     logger.info("🔌 Ultimate conversation session started")
     
-    conversation = ConversationManager()
+    try:
+        conversation = _CONVERSATION_POOL.get_nowait()
+    except asyncio.QueueEmpty:
+        conversation = ConversationManager()
+    
+    # Everything goes out through one writer task, in order, while this coroutine reads and generates
+    outbound: "asyncio.Queue[Union[Dict, str, None]]" = asyncio.Queue()
+    writer = asyncio.create_task(write_frames(websocket, outbound))
+    handler = asyncio.current_task()
+    closing = False
+    
+    def on_writer_done(task: asyncio.Task):
+        """A failed writer ends the session instead of leaving the reader queuing frames nobody sends"""
+        if closing or task.cancelled() or task.exception() is None:
+            return
+        logger.error("❌ Sending failed, ending session: %s", task.exception(), exc_info=task.exception())
+        handler.cancel()
+    
+    writer.add_done_callback(on_writer_done)
+    
+    async def send_frame(payload: Union[Dict, str]):
+        """Queue a frame for the writer"""
+        if writer.done():
+            raise RuntimeError("WebSocket writer has stopped")
+        await outbound.put(payload)
+    
+    async def send_chunk(text: str):
+        """Forward a piece of the follow-up while Gemini is still generating it"""
+        await send_frame({"type": "follow_up_chunk", "text": text})
     
     try:
         while True:
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data = orjson.loads(data)
             
             message_type = message_data.get("type")
             user_message = message_data.get("message", "").strip()
             
-            logger.info(f"📥 Received: {message_type} - {user_message}")
+            if len(user_message) > MAX_MESSAGE_CHARS:
+                await send_frame({
+                    "type": "error",
+                    "message": "Whoa, that's a novel! 📚 Mind trimming it down a bit?"
+                })
+                continue
             
-            if message_type == "initial":
-                if not user_message:
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": "Come on, give me something real to work with! 😊"
-                    })
-                    continue
+            logger.info("📥 Received: %s - %s", message_type, user_message)
+            
+            if message_type == "answer" and conversation.is_complete():
+                # The last answer has no follow-up but still counts towards the analysis
+                conversation.add_user_turn(user_message)
                 
-                # Generate first mind-bending follow-up
-                follow_up = conversation.generate_follow_up_question(user_message)
-                conversation.add_to_history(user_message, follow_up)
-                conversation.increment_follow_up()
+                # The whole reveal goes out as one frame; the client paces the phases itself
+                bonus_package = conversation.get_ultimate_bonus_package()
                 
-                await websocket.send_json({
-                    "type": "follow_up",
-                    "question": follow_up,
-                    "number": conversation.follow_up_count,
-                    "total": conversation.max_follow_ups
-                })
-            
-            elif message_type == "answer":
-                if conversation.is_complete():
-                    # PHASE 1: Initial thank you
-                    await websocket.send_json({
-                        "type": "complete",
-                        "message": "Thanks, we have got your data."
-                    })
-                    
-                    # Small pause for dramatic effect
-                    await asyncio.sleep(1.5)
-                    
-                    # PHASE 2: Wait message
-                    await websocket.send_json({
-                        "type": "thinking",
-                        "message": "Wait..."
-                    })
-                    
-                    await asyncio.sleep(1)
-                    
-                    # PHASE 3: Processing message
-                    await websocket.send_json({
-                        "type": "thinking",
-                        "message": "I'm analyzing what you just told me... 🤔"
-                    })
-                    
-                    await asyncio.sleep(2)
-                    
-                    # PHASE 4: Revelation
-                    await websocket.send_json({
-                        "type": "thinking",
-                        "message": "Okay, I think I figured you out. This is scary accurate... 👀"
-                    })
-                    
-                    await asyncio.sleep(1.5)
-                    
+                await send_frame(encode_reveal_sequence([
+                    # PHASES 1-4: Thank you, then the build-up
+                    *_REVEAL_INTRO_PHASES,
                     # PHASE 5: The ULTIMATE BONUS PACKAGE
-                    bonus_package = conversation.get_ultimate_bonus_package()
-                    
-                    await websocket.send_json({
-                        "type": "personality_reveal",
-                        "bonus": {
-                            "title": "🎯 PERSONALITY UNLOCKED",
-                            "subtitle": f"After analyzing your responses, I think you're...",
-                            "personality_type": bonus_package["personality"]["type"],
-                            "traits": bonus_package["personality"]["traits"],
-                            "description": bonus_package["personality"]["description"],
-                            "advice": bonus_package["personality"]["advice"],
-                            "prediction": bonus_package["personality"]["prediction"],
-                            "secret_strength": bonus_package["personality"]["secret_strength"],
-                            "challenge": bonus_package["personality"]["challenge"],
-                            "would_succeed_at": bonus_package["personality"]["would_succeed_at"],
-                            "scores": {
-                                "engagement": bonus_package["personality"]["engagement_score"],
-                                "honesty": bonus_package["personality"]["honesty_level"]
-                            },
-                            "mind_reading": bonus_package["mind_reading"],
-                            "future_vision": bonus_package["future_vision"],
-                            "personal_challenge": bonus_package["personal_challenge"]
-                        }
-                    })
-                    
-                    await asyncio.sleep(3)
-                    
+                    (1.5, encode_personality_reveal(bonus_package)),
                     # PHASE 6: Mind Reading Game
-                    await websocket.send_json({
+                    (3, {
                         "type": "mind_reading",
                         "data": bonus_package["mind_reading"]
-                    })
-                    
-                    await asyncio.sleep(2)
-                    
+                    }),
                     # PHASE 7: Secret Message Unlock
-                    await websocket.send_json({
+                    (2, {
                         "type": "secret_unlock",
                         "data": {
                             "title": "🔓 SECRET MESSAGE UNLOCKED",
@@ -858,48 +1423,37 @@ async def websocket_endpoint(websocket: WebSocket):
                             "from": "Future You",
                             "encrypted": False
                         }
-                    })
-                    
-                    await asyncio.sleep(2)
-                    
+                    }),
                     # PHASE 8: The Twist - Interactive Choice
-                    await websocket.send_json({
-                        "type": "interactive_choice",
-                        "data": {
-                            "title": "⚡ One More Thing...",
-                            "question": "Want to see what I REALLY think about you?",
-                            "subtitle": "(This part might surprise you)",
-                            "options": [
-                                {"id": "reveal", "text": "Show me 👀", "emoji": "🔥"},
-                                {"id": "skip", "text": "Nah, I'm good", "emoji": "😌"}
-                            ]
-                        }
-                    })
-                    
-                    logger.info(f"✅ Ultimate experience delivered: {bonus_package['personality']['type']}")
-                    # Don't break yet - wait for their choice
+                    (2, _INTERACTIVE_CHOICE_FRAME)
+                ]))
                 
-                else:
-                    # Generate next creative follow-up
-                    follow_up = conversation.generate_follow_up_question(user_message)
-                    conversation.add_to_history(user_message, follow_up)
-                    conversation.increment_follow_up()
-                    
-                    await websocket.send_json({
-                        "type": "follow_up",
-                        "question": follow_up,
-                        "number": conversation.follow_up_count,
-                        "total": conversation.max_follow_ups
+                logger.info("✅ Ultimate experience delivered: %s", bonus_package['personality']['type'])
+                # Don't break yet - wait for their choice
+            
+            elif message_type in ("initial", "answer"):
+                if message_type == "initial" and not user_message:
+                    await send_frame({
+                        "type": "error",
+                        "message": "Come on, give me something real to work with! 😊"
                     })
+                    continue
+                
+                # Generate the next mind-bending follow-up
+                follow_up = await conversation.generate_follow_up_question(user_message, on_chunk=send_chunk)
+                conversation.add_to_history(user_message, follow_up)
+                
+                # The full question closes any streamed chunks (and wins if the fallback replaced them)
+                await send_frame(encode_follow_up(follow_up, conversation.follow_up_count, conversation.max_follow_ups))
 
             elif message_type == "choice_response":
                 choice_id = message_data.get("choice_id")
                 
                 if choice_id == "reveal":
-                    # THE ULTIMATE REVEAL
+                    # THE ULTIMATE REVEAL - same analysis that was shown in personality_reveal
                     personality = conversation.get_ultimate_bonus_package()["personality"]
                     
-                    await websocket.send_json({
+                    await send_frame({
                         "type": "ultimate_reveal",
                         "data": {
                             "title": "🎭 THE UNFILTERED TRUTH",
@@ -923,69 +1477,87 @@ async def websocket_endpoint(websocket: WebSocket):
                     await asyncio.sleep(2)
                     
                     # Final Final Message - The Memorable Ending
-                    await websocket.send_json({
+                    await send_frame({
                         "type": "finale",
                         "data": {
                             "title": "✨ EXPERIENCE COMPLETE",
                             "stats": {
                                 "questions_answered": 3,
-                                "insights_shared": len(conversation.conversation_history),
+                                "insights_shared": len(conversation.ai_questions),
                                 "time_well_spent": "Absolutely",
                                 "memories_created": "1 (hopefully)"
                             },
-                            "achievement": {
-                                "title": "🏆 Achievement Unlocked",
-                                "name": "Self-Discovery Hero",
-                                "description": "Completed the conversation and discovered something about yourself"
-                            },
-                            "easter_egg": "P.S. Most people skip the detailed answers. You didn't. That says something about you. 😏",
-                            "cta": {
-                                "primary": "Start Over (Try Different Answers)",
-                                "secondary": "Share Your Results"
-                            }
+                            **_FINALE_STATIC
                         }
                     })
                     
                 elif choice_id == "skip":
-                    await websocket.send_json({
-                        "type": "respectful_ending",
-                        "data": {
-                            "message": "Respect. Not everyone wants the full deep-dive. 😌",
-                            "fun_fact": "You chose to skip, which actually tells me you're either:\na) Confident in yourself already, or\nb) Prefer to discover things your own way\n\nEither way? That's cool. 💪",
-                            "final_words": "Keep being you. The world needs more people who know when to say 'enough'. ✌️",
-                            "cta": "Start Over"
-                        }
-                    })
+                    await send_frame(_RESPECTFUL_ENDING_FRAME)
                 
                 break
 
             else:
-                await websocket.send_json({
+                await send_frame({
                     "type": "error",
                     "message": "Hmm, didn't catch that. Try again? 🤔"
                 })
     
     except WebSocketDisconnect:
         logger.info("🔌 User disconnected")
-    except Exception as e:
-        logger.error(f"❌ Error: {str(e)}")
+    except asyncio.CancelledError:
+        # Cancelled by on_writer_done, which already logged why; anything else is a real cancellation
+        if not writer.done():
+            raise
         try:
-            await websocket.send_json({
+            await websocket.close(code=1011)
+        except Exception as e:
+            logger.info("🔌 Connection already gone: %s", e)
+    except Exception as e:
+        logger.error("❌ Error: %s", e)
+        if not writer.done():
+            outbound.put_nowait({
                 "type": "error",
                 "message": "Oops, something went sideways. Mind trying that again? 😅"
             })
-        except:
-            pass
     finally:
+        # Flush what is queued, then stop the writer
+        closing = True
+        if not writer.done():
+            outbound.put_nowait(None)
+            try:
+                await writer
+            except Exception as e:
+                logger.info("🔌 Could not flush remaining frames: %s", e)
+        
+        # Hand the cleared manager back for the next session
+        conversation.reset()
+        if not _CONVERSATION_POOL.full():
+            _CONVERSATION_POOL.put_nowait(conversation)
         logger.info("🔌 Session ended")
 
 
+# Registered as a plain Starlette route: the handler only needs the WebSocket, so FastAPI's dependency resolution is skipped
+app.router.add_websocket_route("/ws", websocket_endpoint)
+
+
 if __name__ == "__main__":
     import uvicorn
+    
+    # ENV=production: one worker per CPU and no file watcher; otherwise a single auto-reloading dev server
+    is_production = os.getenv("ENV") == "production"
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
+        port=int(os.getenv("PORT", 8000)),
+        reload=not is_production,
+        workers=os.cpu_count() if is_production else 1,
+        # uvicorn builds its loop before importing main:app, so this is what selects uvloop
+        loop="uvloop" if uvloop is not None else "asyncio",
+        http="httptools",
+        # Bound per-connection memory and drop dead clients
+        ws_max_size=65536,
+        ws_max_queue=32,
+        ws_ping_interval=20,
+        ws_ping_timeout=20,
+        log_level="warning" if is_production else "info"
     )
\ No newline at end of file
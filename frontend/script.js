@@ -29,7 +29,8 @@ const state = {
     currentQuestionNumber: 0,
     totalQuestions: 3,
     isWaitingForChoice: false,
-    countdownInterval: null
+    countdownInterval: null,
+    streamingBubble: null
 };
 
 // ==========================================
@@ -106,68 +107,83 @@ function handleWebSocketOpen() {
 
 /**
  * Handle incoming WebSocket messages
- * ULTIMATE VERSION: All 10 phases supported
  */
 function handleWebSocketMessage(event) {
     try {
         const data = JSON.parse(event.data);
         console.log('Received message:', data);
         
-        switch (data.type) {
-            case 'follow_up':
-                if (data.total) state.totalQuestions = data.total;
-                handleFollowUpQuestion(data);
-                break;
-            
-            case 'complete':
-                handleInitialComplete(data);
-                break;
-            
-            case 'thinking':
-                handleThinkingMessage(data);
-                break;
-            
-            case 'personality_reveal':
-                handlePersonalityReveal(data);
-                break;
-            
-            case 'mind_reading':
-                handleMindReading(data);
-                break;
-            
-            case 'secret_unlock':
-                handleSecretUnlock(data);
-                break;
-            
-            case 'interactive_choice':
-                handleInteractiveChoice(data);
-                break;
-            
-            case 'ultimate_reveal':
-                handleUltimateReveal(data);
-                break;
-            
-            case 'finale':
-                handleFinale(data);
-                break;
-            
-            case 'respectful_ending':
-                handleRespectfulEnding(data);
-                break;
-            
-            case 'error':
-                showError(data.message);
-                break;
-            
-            default:
-                console.warn('Unknown message type:', data.type);
-        }
+        dispatchServerMessage(data);
     } catch (error) {
         console.error('Error parsing message:', error);
         showError('Failed to process server response.');
     }
 }
 
+/**
+ * Route a server message to its handler
+ * ULTIMATE VERSION: All 10 phases supported
+ */
+function dispatchServerMessage(data) {
+    switch (data.type) {
+        case 'follow_up_chunk':
+            handleFollowUpChunk(data);
+            break;
+        
+        case 'follow_up':
+            if (data.total) state.totalQuestions = data.total;
+            handleFollowUpQuestion(data);
+            break;
+        
+        case 'complete':
+            handleInitialComplete(data);
+            break;
+        
+        case 'thinking':
+            handleThinkingMessage(data);
+            break;
+        
+        case 'personality_reveal':
+            handlePersonalityReveal(data);
+            break;
+        
+        case 'mind_reading':
+            handleMindReading(data);
+            break;
+        
+        case 'secret_unlock':
+            handleSecretUnlock(data);
+            break;
+        
+        case 'interactive_choice':
+            handleInteractiveChoice(data);
+            break;
+        
+        case 'ultimate_reveal':
+            handleUltimateReveal(data);
+            break;
+        
+        case 'finale':
+            handleFinale(data);
+            break;
+        
+        case 'respectful_ending':
+            handleRespectfulEnding(data);
+            break;
+        
+        case 'reveal_sequence':
+            handleRevealSequence(data);
+            break;
+        
+        case 'error':
+            showError(data.message);
+            break;
+        
+        default:
+            console.warn('Unknown message type:', data.type);
+    }
+}
+
 /**
  * Handle WebSocket errors
  */
@@ -275,6 +291,7 @@ function showChatScreen() {
 
 /**
  * Add message to chat
+ * Returns the bubble so streamed text can be appended to it
  */
 function addMessage(content, isUser = false) {
     const messageDiv = document.createElement('div');
@@ -302,6 +319,7 @@ function addMessage(content, isUser = false) {
     elements.chatMessages.appendChild(messageDiv);
     
     scrollToBottom();
+    return bubble;
 }
 
 /**
@@ -374,6 +392,19 @@ function scrollToBottom() {
 // NEW: Multi-Phase Message Handlers
 // ==========================================
 
+/**
+ * Play a batched reveal sequence
+ * Each phase wraps a regular server message, shown display_after_ms after the previous one
+ */
+function handleRevealSequence(data) {
+    let elapsed = 0;
+    
+    data.phases.forEach(phase => {
+        elapsed += phase.display_after_ms;
+        setTimeout(() => dispatchServerMessage(phase.frame), elapsed);
+    });
+}
+
 /**
  * Handle initial complete message
  */
@@ -764,10 +795,36 @@ function cancelCountdown() {
 // Original Message Handlers (Enhanced)
 // ==========================================
 
+/**
+ * Handle a streamed piece of the next follow-up question
+ */
+function handleFollowUpChunk(data) {
+    if (!state.streamingBubble) {
+        removeTypingIndicator();
+        state.streamingBubble = addMessage(data.text, false);
+        return;
+    }
+    
+    state.streamingBubble.textContent += data.text;
+    scrollToBottom();
+}
+
 /**
  * Handle follow-up question from AI
  */
 function handleFollowUpQuestion(data) {
+    // Streamed already: swap in the final text, no typing delay
+    if (state.streamingBubble) {
+        state.streamingBubble.textContent = data.question;
+        state.streamingBubble = null;
+        
+        state.currentQuestionNumber = data.number;
+        updateProgress();
+        
+        setInputEnabled(true);
+        return;
+    }
+    
     setTimeout(() => {
         removeTypingIndicator();
         addMessage(data.question, false);
@@ -846,6 +903,7 @@ function handleRestart() {
     state.currentQuestionNumber = 0;
     state.conversationActive = false;
     state.isWaitingForChoice = false;
+    state.streamingBubble = null;
     
     // Show welcome screen
     showWelcomeScreen();